@@ -628,14 +628,14 @@ class StorageContext:
     @staticmethod
     def get_experiment_dir_name(run_obj: Union[str, Callable, Type]) -> str:
         from ray.tune.experiment import Experiment
-        from ray.tune.utils import date_str
+        from ray.tune.experiment.experiment import _cached_date_str
 
         run_identifier = Experiment.get_trainable_name(run_obj)
 
         if bool(int(os.environ.get("TUNE_DISABLE_DATED_SUBDIR", 0))):
             dir_name = run_identifier
         else:
-            dir_name = "{}_{}".format(run_identifier, date_str())
+            dir_name = "{}_{}".format(run_identifier, _cached_date_str())
         return dir_name
 
     @staticmethod
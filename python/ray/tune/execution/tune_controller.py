@@ -375,7 +375,7 @@ class TuneController:
                 factoring in grid search samplers.
         """
         experiment = experiments[0]
-        spec = experiment.public_spec if experiment else {}
+        spec = dict(experiment.public_spec) if experiment else {}
         spec["total_num_samples"] = total_num_samples
         self._callbacks.setup(**spec)
 
@@ -1,14 +1,12 @@
-import copy
 import datetime
 import warnings
 from functools import partial
-import grpc
 import logging
 import os
+import time
 from pathlib import Path
 from pickle import PicklingError
-import pprint as pp
-import traceback
+from types import MappingProxyType
 from typing import (
     Any,
     Dict,
@@ -19,6 +17,7 @@ from typing import (
     Type,
     List,
     Mapping,
+    Tuple,
     TYPE_CHECKING,
 )
 
@@ -46,18 +45,27 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Read once at import time: changing the environment variable afterwards has
+# no effect on experiments created in this process. Only an exact "1" enables
+# it, so malformed values can't make the import fail.
+_DISABLE_DATED_SUBDIR = os.environ.get("TUNE_DISABLE_DATED_SUBDIR", "0") == "1"
+
+# Maximum number of characters of a spec to include in error messages.
+_MAX_SPEC_ERROR_LENGTH = 4096
+
 
 def _validate_log_to_file(log_to_file):
     """Validate ``train.RunConfig``'s ``log_to_file`` parameter. Return
     validated relative stdout and stderr filenames."""
+    # Check concrete types before falling back to the (slower) `Sequence` ABC.
     if not log_to_file:
         stdout_file = stderr_file = None
-    elif isinstance(log_to_file, bool) and log_to_file:
+    elif log_to_file is True:
         stdout_file = "stdout"
         stderr_file = "stderr"
     elif isinstance(log_to_file, str):
         stdout_file = stderr_file = log_to_file
-    elif isinstance(log_to_file, Sequence):
+    elif isinstance(log_to_file, (tuple, list)) or isinstance(log_to_file, Sequence):
         if len(log_to_file) != 2:
             raise ValueError(
                 "If you pass a Sequence to `log_to_file` it has to have "
@@ -75,21 +83,92 @@ def _validate_log_to_file(log_to_file):
     return stdout_file, stderr_file
 
 
+def _combine_stoppers(*stoppers: Stopper) -> CombinedStopper:
+    """Combine stoppers into a single, flat ``CombinedStopper``.
+
+    Nested ``CombinedStopper`` objects are unpacked, so that each stop check
+    only goes through one level of indirection. Evaluation order is kept.
+    """
+    flat_stoppers = []
+    for stopper in stoppers:
+        # Subclasses may change the combination semantics, so only unpack
+        # plain `CombinedStopper` objects.
+        if type(stopper) is CombinedStopper:
+            flat_stoppers.extend(stopper._stoppers)
+        else:
+            flat_stoppers.append(stopper)
+    return CombinedStopper(*flat_stoppers)
+
+
+def _normalize_user_path(path: str) -> str:
+    """Expand ``~`` in ``path`` and make it absolute."""
+    return os.path.abspath(os.path.expanduser(path))
+
+
 def _get_local_dir_with_expand_user(local_dir: Optional[str]) -> str:
-    return os.path.abspath(os.path.expanduser(local_dir or _get_defaults_results_dir()))
+    return _normalize_user_path(local_dir or _get_defaults_results_dir())
+
+
+class _LegacyStoragePaths:
+    """Local and remote storage paths of an experiment (legacy persistence mode).
+
+    The storage arguments are validated on construction, but the local path is
+    only expanded when it's first accessed. Instances can be shared between
+    experiments with the same storage arguments (see
+    ``Experiment.from_json_batch``).
+    """
+
+    def __init__(
+        self,
+        storage_path: Optional[str],
+        local_dir: Optional[str],
+        upload_dir: Optional[str],
+    ):
+        local_storage_path, self.remote_path = _resolve_storage_path(
+            storage_path,
+            local_dir,
+            upload_dir,
+            error_location="Experiment",
+        )
+        if local_dir:
+            local_storage_path = local_dir
+
+        self._local_storage_path = local_storage_path
+        self._local_path = None
+
+    @property
+    def local_path(self) -> str:
+        if self._local_path is None:
+            self._local_path = _get_local_dir_with_expand_user(self._local_storage_path)
+        return self._local_path
+
+
+# `(whole second, date_str())` of the last generated dated directory suffix.
+_date_str_cache: Optional[Tuple[int, str]] = None
+
+
+def _cached_date_str() -> str:
+    """Returns ``date_str()``, reusing the formatted value within the same second.
+
+    Experiments are often created in bursts, and the string only has a
+    resolution of one second anyway.
+    """
+    global _date_str_cache
+    now = int(time.time())
+    cache = _date_str_cache
+    if cache is None or cache[0] != now:
+        cache = (now, date_str())
+        _date_str_cache = cache
+    return cache[1]
 
 
 def _get_dir_name(run, explicit_name: Optional[str], combined_name: str) -> str:
     # If the name has been set explicitly, we don't want to create
     # dated directories. The same is true for string run identifiers.
-    if (
-        int(os.environ.get("TUNE_DISABLE_DATED_SUBDIR", 0)) == 1
-        or explicit_name
-        or isinstance(run, str)
-    ):
+    if _DISABLE_DATED_SUBDIR or explicit_name or isinstance(run, str):
         dir_name = combined_name
     else:
-        dir_name = "{}_{}".format(combined_name, date_str())
+        dir_name = "{}_{}".format(combined_name, _cached_date_str())
     return dir_name
 
 
@@ -126,8 +205,27 @@ class Experiment:
             the directory path will be deduced from trainable name instead.
     """
 
+    __slots__ = (
+        "_run_identifier",
+        "_storage",
+        "_storage_args",
+        "_legacy_storage_paths",
+        "_legacy_local_storage_path",
+        "_legacy_remote_storage_path",
+        "_cached_local_path",
+        "_cached_remote_path",
+        "_legacy_sync_config",
+        "_legacy_dir_name",
+        "_legacy_name",
+        "_stopper",
+        "_spec",
+        "_spec_paths_resolved",
+        "_public_spec",
+        "__weakref__",
+    )
+
     # Keys that will be present in `public_spec` dict.
-    PUBLIC_KEYS = {"stop", "num_samples", "time_budget_s"}
+    PUBLIC_KEYS = frozenset({"stop", "num_samples", "time_budget_s"})
 
     def __init__(
         self,
@@ -154,6 +252,8 @@ class Experiment:
         restore: Optional[str] = None,
         # Deprecated
         local_dir: Optional[str] = None,
+        # Internal: set by `from_json_batch`
+        _storage_paths: Optional[_LegacyStoragePaths] = None,
     ):
         if isinstance(checkpoint_config, dict):
             checkpoint_config = CheckpointConfig(**checkpoint_config)
@@ -179,50 +279,50 @@ class Experiment:
         try:
             self._run_identifier = Experiment.register_if_needed(run)
         except RpcError as e:
+            import grpc
+
             if e.rpc_code == grpc.StatusCode.RESOURCE_EXHAUSTED.value[0]:
                 raise TuneError(
-                    f"The Trainable/training function is too large for grpc resource "
-                    f"limit. Check that its definition is not implicitly capturing a "
-                    f"large array or other object in scope. "
-                    f"Tip: use tune.with_parameters() to put large objects "
-                    f"in the Ray object store. \n"
-                    f"Original exception: {traceback.format_exc()}"
-                )
+                    "The Trainable/training function is too large for grpc resource "
+                    "limit. Check that its definition is not implicitly capturing a "
+                    "large array or other object in scope. "
+                    "Tip: use tune.with_parameters() to put large objects "
+                    "in the Ray object store."
+                ) from e
             else:
                 raise e
 
-        self.storage = None
+        # Storage arguments are validated and the experiment directory name is
+        # picked right away, but the `StorageContext` and the expanded local
+        # paths are only built on first access (see `storage` and
+        # `_ensure_legacy_paths`), as many consumers of an `Experiment` only
+        # ever need its spec or run identifier.
+        self._storage = None
+        self._storage_args = None
+        self._legacy_storage_paths = None
+        self._legacy_local_storage_path = None
+        self._legacy_remote_storage_path = None
+        self._cached_local_path = None
+        self._cached_remote_path = None
+        self._legacy_sync_config = None
+        self._legacy_dir_name = None
+        self._legacy_name = None
         if _use_storage_context():
             assert name is not None
-
-            self.storage = StorageContext(
-                storage_path=storage_path,
-                storage_filesystem=storage_filesystem,
-                sync_config=sync_config,
-                experiment_dir_name=name,
-            )
-            logger.debug(f"StorageContext on the DRIVER:\n{self.storage}")
-
-            self._legacy_local_storage_path = None
-            self._legacy_remote_storage_path = None
-            self.legacy_sync_config = None
-            self.legacy_dir_name = None
-            self.legacy_name = None
+            self._storage_args = (storage_path, storage_filesystem, sync_config, name)
         else:
             if isinstance(sync_config, dict):
                 sync_config = SyncConfig(**sync_config)
             else:
                 sync_config = sync_config or SyncConfig()
 
-            self.legacy_sync_config = sync_config
+            self._legacy_sync_config = sync_config
 
-            # Resolve storage_path
-            local_storage_path, remote_storage_path = _resolve_storage_path(
-                storage_path,
-                local_dir,
-                sync_config.upload_dir,
-                error_location="Experiment",
-            )
+            storage_paths = _storage_paths
+            if storage_paths is None:
+                storage_paths = _LegacyStoragePaths(
+                    storage_path, local_dir, sync_config.upload_dir
+                )
 
             if local_dir:
                 if log_once("tune_experiment_local_dir"):
@@ -232,43 +332,45 @@ class Experiment:
                         "environment variable instead."
                     )
 
-                local_storage_path = local_dir
-
-            full_local_storage_path = _get_local_dir_with_expand_user(
-                local_storage_path
-            )
-
             # `_experiment_checkpoint_dir` is for internal use only for better
             # support of Tuner API.
-            # If set, it should be a subpath under `local_dir`. Also deduce `dir_name`.
+            # If set, it should be a subpath under `local_dir`. Also deduce
+            # `dir_name`.
             if _experiment_checkpoint_dir:
-                experiment_checkpoint_dir_path = Path(_experiment_checkpoint_dir)
-                local_dir_path = Path(full_local_storage_path)
-                assert local_dir_path in experiment_checkpoint_dir_path.parents, (
-                    local_dir_path,
-                    str(list(experiment_checkpoint_dir_path.parents)),
+                full_local_storage_path = storage_paths.local_path
+                # Compare case-normalized paths, like `Path` equality does.
+                checkpoint_dir = os.path.normcase(
+                    os.path.normpath(_experiment_checkpoint_dir)
+                )
+                local_dir_prefix = os.path.join(
+                    os.path.normcase(os.path.normpath(full_local_storage_path)), ""
+                )
+                assert checkpoint_dir.startswith(local_dir_prefix), (
+                    full_local_storage_path,
+                    _experiment_checkpoint_dir,
                 )
                 # `dir_name` is set by `_experiment_checkpoint_dir` indirectly.
-                self.legacy_dir_name = os.path.relpath(
+                dir_name = os.path.relpath(
                     _experiment_checkpoint_dir, full_local_storage_path
                 )
+            else:
+                dir_name = _get_dir_name(run, name, name or self._run_identifier)
 
-            self._legacy_local_storage_path = full_local_storage_path
-            self._legacy_remote_storage_path = remote_storage_path
-
-            self.legacy_name = name or self._run_identifier
-
-            if not _experiment_checkpoint_dir:
-                self.legacy_dir_name = _get_dir_name(run, name, self.legacy_name)
+            assert dir_name
 
-            assert self.legacy_dir_name
+            self._legacy_name = name or self._run_identifier
+            self._legacy_dir_name = dir_name
+            self._legacy_storage_paths = storage_paths
 
         config = config or {}
 
         self._stopper = None
         stopping_criteria = {}
+        # Checked roughly in order of how commonly each form is passed.
         if not stop:
             pass
+        elif isinstance(stop, dict):
+            stopping_criteria = stop
         elif isinstance(stop, list):
             bad_stoppers = [s for s in stop if not isinstance(s, Stopper)]
             if bad_stoppers:
@@ -278,14 +380,13 @@ class Experiment:
                     "`train.RunConfig()`, each element must be an instance of "
                     f"`tune.stopper.Stopper`. Got {stopper_types}."
                 )
-            self._stopper = CombinedStopper(*stop)
-        elif isinstance(stop, dict):
-            stopping_criteria = stop
+            self._stopper = _combine_stoppers(*stop)
+        elif isinstance(stop, Stopper):
+            # Checked before `callable`, as `Stopper` instances are callable.
+            self._stopper = stop
         elif callable(stop):
             if FunctionStopper.is_valid_function(stop):
                 self._stopper = FunctionStopper(stop)
-            elif isinstance(stop, Stopper):
-                self._stopper = stop
             else:
                 raise ValueError(
                     "Provided stop object must be either a dict, "
@@ -300,7 +401,7 @@ class Experiment:
 
         if time_budget_s:
             if self._stopper:
-                self._stopper = CombinedStopper(
+                self._stopper = _combine_stoppers(
                     self._stopper, TimeoutStopper(time_budget_s)
                 )
             else:
@@ -315,21 +416,44 @@ class Experiment:
             "config": config,
             "resources_per_trial": resources_per_trial,
             "num_samples": num_samples,
-            "experiment_path": self.path,
-            "experiment_dir_name": self.legacy_dir_name,
-            "sync_config": self.legacy_sync_config,
+            # Filled in lazily by the `spec` property.
+            "experiment_path": None,
+            "experiment_dir_name": None,
+            "sync_config": None,
             "checkpoint_config": checkpoint_config,
             "trial_name_creator": trial_name_creator,
             "trial_dirname_creator": trial_dirname_creator,
             "log_to_file": (stdout_file, stderr_file),
             "export_formats": export_formats or [],
             "max_failures": max_failures,
-            "restore": os.path.abspath(os.path.expanduser(restore))
-            if restore
-            else None,
-            "storage": self.storage,
+            "restore": _normalize_user_path(restore) if restore else None,
+            "storage": None,
         }
-        self.spec = spec
+        self._spec = spec
+        self._spec_paths_resolved = False
+        # None of the public keys are mutated after construction, so the
+        # projection can be computed once.
+        self._public_spec = {k: v for k, v in spec.items() if k in self.PUBLIC_KEYS}
+
+    def _ensure_legacy_paths(self):
+        """Expand the legacy local/remote experiment paths on first access."""
+        if self._legacy_storage_paths is None:
+            return
+
+        storage_paths = self._legacy_storage_paths
+        full_local_storage_path = storage_paths.local_path
+        remote_storage_path = storage_paths.remote_path
+        dir_name = self._legacy_dir_name
+
+        self._legacy_local_storage_path = full_local_storage_path
+        self._legacy_remote_storage_path = remote_storage_path
+
+        # Join the experiment paths once, as they are read on every trial event.
+        self._cached_local_path = str(Path(full_local_storage_path) / dir_name)
+        if remote_storage_path:
+            self._cached_remote_path = str(URI(remote_storage_path) / dir_name)
+
+        self._legacy_storage_paths = None
 
     @classmethod
     def from_json(cls, name: str, spec: dict):
@@ -339,15 +463,53 @@ class Experiment:
             name: Name of Experiment.
             spec: JSON configuration of experiment.
         """
+        return cls._from_normalized_json(name, cls._normalize_json_spec(spec))
+
+    @classmethod
+    def from_json_batch(cls, specs: Dict[str, dict]) -> List["Experiment"]:
+        """Generates a list of Experiment objects from a dict of JSON specs.
+
+        Equivalent to calling ``from_json`` for each item, but experiments with
+        the same storage arguments share their (lazily expanded) storage paths,
+        so these are only resolved once.
+
+        Args:
+            specs: Mapping of experiment names to JSON configurations.
+        """
+        shared_storage_paths = {}
+        experiments = []
+        for name, spec in specs.items():
+            spec = cls._normalize_json_spec(spec)
+            storage_paths = None
+            if not _use_storage_context():
+                sync_config = spec.get("sync_config")
+                key = (
+                    spec.get("storage_path"),
+                    spec.get("local_dir"),
+                    sync_config.upload_dir if sync_config else None,
+                )
+                if key not in shared_storage_paths:
+                    shared_storage_paths[key] = _LegacyStoragePaths(*key)
+                storage_paths = shared_storage_paths[key]
+            experiments.append(
+                cls._from_normalized_json(name, spec, _storage_paths=storage_paths)
+            )
+        return experiments
+
+    @staticmethod
+    def _normalize_json_spec(spec: dict) -> dict:
+        """Returns a copy of a JSON spec with nested configs converted."""
         if "run" not in spec:
             raise TuneError("No trainable specified!")
 
+        # Shallow copy so we don't mutate the caller's spec. Nested values
+        # are not modified in place below, so they can be shared.
+        spec = dict(spec)
+
         # Special case the `env` param for RLlib by automatically
         # moving it into the `config` section.
         if "env" in spec:
-            spec["config"] = spec.get("config", {})
-            spec["config"]["env"] = spec["env"]
-            del spec["env"]
+            spec["config"] = {**spec.get("config", {}), "env": spec.pop("env")}
 
         if "sync_config" in spec and isinstance(spec["sync_config"], dict):
             spec["sync_config"] = SyncConfig(**spec["sync_config"])
@@ -355,15 +517,22 @@ class Experiment:
         if "checkpoint_config" in spec and isinstance(spec["checkpoint_config"], dict):
             spec["checkpoint_config"] = CheckpointConfig(**spec["checkpoint_config"])
 
-        spec = copy.deepcopy(spec)
+        return spec
 
+    @classmethod
+    def _from_normalized_json(cls, name: str, spec: dict, **kwargs):
         run_value = spec.pop("run")
         try:
-            exp = cls(name, run_value, **spec)
+            exp = cls(name, run_value, **spec, **kwargs)
         except TypeError as e:
+            import pprint
+
+            spec_str = pprint.pformat(spec)
+            if len(spec_str) > _MAX_SPEC_ERROR_LENGTH:
+                spec_str = spec_str[:_MAX_SPEC_ERROR_LENGTH] + "... [truncated]"
             raise TuneError(
                 f"Failed to load the following Tune experiment "
-                f"specification:\n\n {pp.pformat(spec)}.\n\n"
+                f"specification:\n\n {spec_str}.\n\n"
                 f"Please check that the arguments are valid. "
                 f"Experiment creation failed with the following "
                 f"error:\n {e}"
@@ -480,6 +649,46 @@ class Experiment:
 
         return os.path.join(local_path, dir_name)
 
+    @property
+    def spec(self) -> Dict[str, Any]:
+        if not self._spec_paths_resolved:
+            self._spec.update(
+                {
+                    "experiment_path": self.path,
+                    "experiment_dir_name": self.legacy_dir_name,
+                    "sync_config": self.legacy_sync_config,
+                    "storage": self.storage,
+                }
+            )
+            self._spec_paths_resolved = True
+        return self._spec
+
+    @property
+    def storage(self) -> Optional[StorageContext]:
+        if self._storage_args is not None:
+            storage_path, storage_filesystem, sync_config, name = self._storage_args
+            self._storage = StorageContext(
+                storage_path=storage_path,
+                storage_filesystem=storage_filesystem,
+                sync_config=sync_config,
+                experiment_dir_name=name,
+            )
+            self._storage_args = None
+            logger.debug(f"StorageContext on the DRIVER:\n{self._storage}")
+        return self._storage
+
+    @property
+    def legacy_sync_config(self) -> Optional[SyncConfig]:
+        return self._legacy_sync_config
+
+    @property
+    def legacy_dir_name(self) -> Optional[str]:
+        return self._legacy_dir_name
+
+    @property
+    def legacy_name(self) -> Optional[str]:
+        return self._legacy_name
+
     @property
     def stopper(self):
         return self._stopper
@@ -489,9 +698,8 @@ class Experiment:
         if _use_storage_context():
             return self.storage.experiment_local_path
 
-        if not self._legacy_local_storage_path:
-            return None
-        return str(Path(self._legacy_local_storage_path) / self.legacy_dir_name)
+        self._ensure_legacy_paths()
+        return self._cached_local_path
 
     @property
     @Deprecated("Replaced by `local_path`")
@@ -504,9 +712,8 @@ class Experiment:
         if _use_storage_context():
             return str(self.storage.storage_prefix / self.storage.experiment_fs_path)
 
-        if not self._legacy_remote_storage_path:
-            return None
-        return str(URI(self._legacy_remote_storage_path) / self.legacy_dir_name)
+        self._ensure_legacy_paths()
+        return self._cached_remote_path
 
     @property
     def path(self) -> Optional[str]:
@@ -514,7 +721,7 @@ class Experiment:
 
     @property
     def checkpoint_config(self):
-        return self.spec.get("checkpoint_config")
+        return self._spec.get("checkpoint_config")
 
     @property
     @Deprecated("Replaced by `checkpoint_dir`")
@@ -535,13 +742,14 @@ class Experiment:
         return self._run_identifier
 
     @property
-    def public_spec(self) -> Dict[str, Any]:
-        """Returns the spec dict with only the public-facing keys.
+    def public_spec(self) -> Mapping[str, Any]:
+        """Returns a read-only view of the spec with only the public-facing keys.
 
         Intended to be used for passing information to callbacks,
         Searchers and Schedulers.
         """
-        return {k: v for k, v in self.spec.items() if k in self.PUBLIC_KEYS}
+        # The cached dict is stored as-is (mapping proxies are not picklable).
+        return MappingProxyType(self._public_spec)
 
 
 def _convert_to_experiment_list(experiments: Union[Experiment, List[Experiment], Dict]):
@@ -557,26 +765,26 @@ def _convert_to_experiment_list(experiments: Union[Experiment, List[Experiment],
     Returns:
         List of experiments.
     """
-    exp_list = experiments
-
     # Transform list if necessary
     if experiments is None:
         exp_list = []
     elif isinstance(experiments, Experiment):
         exp_list = [experiments]
     elif type(experiments) is dict:
-        exp_list = [
-            Experiment.from_json(name, spec) for name, spec in experiments.items()
-        ]
-
-    # Validate exp_list
-    if type(exp_list) is list and all(isinstance(exp, Experiment) for exp in exp_list):
-        if len(exp_list) > 1:
-            logger.info(
-                "Running with multiple concurrent experiments. "
-                "All experiments will be using the same SearchAlgorithm."
-            )
+        # `Experiment.from_json_batch` only returns `Experiment` objects, so
+        # the resulting list does not need to be validated again.
+        exp_list = Experiment.from_json_batch(experiments)
+    elif isinstance(experiments, list):
+        exp_list = experiments
+        if not all(isinstance(exp, Experiment) for exp in exp_list):
+            raise TuneError("Invalid argument: {}".format(experiments))
     else:
         raise TuneError("Invalid argument: {}".format(experiments))
 
+    if len(exp_list) > 1:
+        logger.info(
+            "Running with multiple concurrent experiments. "
+            "All experiments will be using the same SearchAlgorithm."
+        )
+
     return exp_list
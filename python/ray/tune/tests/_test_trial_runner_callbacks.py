@@ -238,7 +238,7 @@ class TrialRunnerCallbacks(unittest.TestCase):
 
         self.assertIn("setup", self.callback.state)
         self.assertTrue(self.callback.state["setup"] is not None)
-        keys = Experiment.PUBLIC_KEYS.copy()
+        keys = set(Experiment.PUBLIC_KEYS)
         keys.add("total_num_samples")
         for key in keys:
             self.assertIn(key, self.callback.state["setup"])
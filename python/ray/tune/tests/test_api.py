@@ -1340,9 +1340,13 @@ class TrainableFunctionApiTest(unittest.TestCase):
                     break
             self.assertFalse(found)
 
-        # Don't append date if we set the env variable
+        # Don't append date if we set the env variable. The variable is read
+        # when `ray.tune.experiment.experiment` is imported, so patch the
+        # resolved value as well.
         os.environ["TUNE_DISABLE_DATED_SUBDIR"] = "1"
-        with tempfile.TemporaryDirectory() as tmp_dir:
+        with tempfile.TemporaryDirectory() as tmp_dir, patch(
+            "ray.tune.experiment.experiment._DISABLE_DATED_SUBDIR", True
+        ):
             tune.run(test_trial_dir, storage_path=tmp_dir)
 
             subdirs = list(os.listdir(tmp_dir))
@@ -1,12 +1,22 @@
+import pickle
 import threading
 import unittest
+from unittest.mock import MagicMock, patch
+
+import pytest
 
 import ray
 from ray.train import CheckpointConfig
 from ray.tune import register_trainable
 from ray.tune.experiment import Experiment, Trial, _convert_to_experiment_list
+from ray.tune.experiment.experiment import (
+    _cached_date_str,
+    _get_local_dir_with_expand_user,
+)
 from ray.tune.error import TuneError
+from ray.tune.stopper import CombinedStopper, MaximumIterationStopper, TimeoutStopper
 from ray.tune.utils import diagnose_serialization
+from ray.tune.utils.util import _resolve_storage_path
 
 
 def test_remote_checkpoint_dir_with_query_string(tmp_path):
@@ -25,6 +35,86 @@ def test_remote_checkpoint_dir_with_query_string(tmp_path):
     assert trial.remote_checkpoint_dir == "s3://bucket/spam/trial_dirname?scheme=http"
 
 
+def test_relative_local_dir_follows_cwd(tmp_path, monkeypatch):
+    """Relative paths must be resolved against the current working directory."""
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+
+    monkeypatch.chdir(tmp_path / "a")
+    assert _get_local_dir_with_expand_user("relative_dir") == str(
+        tmp_path / "a" / "relative_dir"
+    )
+
+    monkeypatch.chdir(tmp_path / "b")
+    assert _get_local_dir_with_expand_user("relative_dir") == str(
+        tmp_path / "b" / "relative_dir"
+    )
+
+
+def test_relative_restore_follows_cwd(tmp_path, monkeypatch):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+
+    monkeypatch.chdir(tmp_path / "a")
+    experiment = Experiment("foo", lambda config: config, restore="checkpoint")
+    assert experiment.spec["restore"] == str(tmp_path / "a" / "checkpoint")
+
+    monkeypatch.chdir(tmp_path / "b")
+    experiment = Experiment("foo", lambda config: config, restore="checkpoint")
+    assert experiment.spec["restore"] == str(tmp_path / "b" / "checkpoint")
+
+
+def test_legacy_paths_are_expanded_lazily(tmp_path):
+    with patch(
+        "ray.tune.experiment.experiment._get_local_dir_with_expand_user",
+        wraps=_get_local_dir_with_expand_user,
+    ) as expand_mock:
+        experiment = Experiment(
+            "foo", lambda config: config, storage_path=str(tmp_path)
+        )
+        assert expand_mock.call_count == 0
+
+        assert experiment.local_path == str(tmp_path / "foo")
+        assert experiment.spec["experiment_path"] == str(tmp_path / "foo")
+        assert expand_mock.call_count == 1
+
+
+def test_storage_context_is_created_lazily(tmp_path, monkeypatch):
+    monkeypatch.setenv("RAY_AIR_NEW_PERSISTENCE_MODE", "1")
+    with patch("ray.tune.experiment.experiment.StorageContext") as storage_mock:
+        experiment = Experiment(
+            "foo", lambda config: config, storage_path=str(tmp_path)
+        )
+        storage_mock.assert_not_called()
+
+        assert experiment.storage is storage_mock.return_value
+        assert experiment.storage is storage_mock.return_value
+        storage_mock.assert_called_once()
+
+
+def test_storage_arguments_are_validated_eagerly(tmp_path):
+    with pytest.raises(ValueError):
+        Experiment(
+            "foo",
+            lambda config: config,
+            storage_path=str(tmp_path / "a"),
+            local_dir=str(tmp_path / "b"),
+        )
+
+
+def test_date_str_is_reused_within_a_second(monkeypatch):
+    module = "ray.tune.experiment.experiment"
+    time_mock = MagicMock()
+    time_mock.time.side_effect = [100.2, 100.7, 101.1]
+    monkeypatch.setattr(f"{module}._date_str_cache", None)
+    monkeypatch.setattr(f"{module}.time", time_mock)
+    monkeypatch.setattr(f"{module}.date_str", MagicMock(side_effect=["a", "b"]))
+
+    assert _cached_date_str() == "a"
+    assert _cached_date_str() == "a"
+    assert _cached_date_str() == "b"
+
+
 class ExperimentTest(unittest.TestCase):
     def tearDown(self):
         ray.shutdown()
@@ -66,9 +156,93 @@ class ExperimentTest(unittest.TestCase):
         self.assertEqual(len(result), 2)
         self.assertEqual(type(result), list)
 
+    def testFromJSONDoesNotMutateSpec(self):
+        config = {"script_min_iter_time_s": 0}
+        spec = {"run": "f1", "env": "CartPole-v1", "config": config}
+        exp = Experiment.from_json("foo", spec)
+        self.assertEqual(exp.spec["config"]["env"], "CartPole-v1")
+        self.assertEqual(spec["env"], "CartPole-v1")
+        self.assertNotIn("env", config)
+
+    def testFromJSONBatch(self):
+        experiments = {
+            "foo": {"run": "f1", "storage_path": "/tmp/ray_results"},
+            "bar": {"run": "f1", "storage_path": "/tmp/ray_results"},
+            "baz": {"run": "f1", "storage_path": "/tmp/other_results"},
+        }
+        with patch(
+            "ray.tune.experiment.experiment._resolve_storage_path",
+            wraps=_resolve_storage_path,
+        ) as resolve_mock, patch(
+            "ray.tune.experiment.experiment._get_local_dir_with_expand_user",
+            wraps=_get_local_dir_with_expand_user,
+        ) as expand_mock:
+            result = Experiment.from_json_batch(experiments)
+            # Storage arguments are resolved once per unique combination ...
+            self.assertEqual(resolve_mock.call_count, 2)
+            # ... but local paths are only expanded when accessed.
+            self.assertEqual(expand_mock.call_count, 0)
+
+            self.assertEqual(
+                [exp.local_path for exp in result],
+                [
+                    "/tmp/ray_results/foo",
+                    "/tmp/ray_results/bar",
+                    "/tmp/other_results/baz",
+                ],
+            )
+            self.assertEqual(expand_mock.call_count, 2)
+
+    def testStoppersAreFlattened(self):
+        inner = CombinedStopper(
+            MaximumIterationStopper(max_iter=1), MaximumIterationStopper(max_iter=2)
+        )
+        exp = Experiment("foo", "f1", stop=[inner], time_budget_s=10)
+        self.assertEqual(type(exp.stopper), CombinedStopper)
+        self.assertEqual(len(exp.stopper._stoppers), 3)
+        self.assertIsInstance(exp.stopper._stoppers[-1], TimeoutStopper)
+
+    def testPublicSpecPickle(self):
+        exp = Experiment("foo", "f1", stop={"training_iteration": 1}, num_samples=2)
+        self.assertEqual(
+            dict(exp.public_spec),
+            {
+                "stop": {"training_iteration": 1},
+                "time_budget_s": None,
+                "num_samples": 2,
+            },
+        )
+        with self.assertRaises(TypeError):
+            exp.public_spec["num_samples"] = 3
+
+        restored = pickle.loads(pickle.dumps(exp))
+        self.assertEqual(dict(restored.public_spec), dict(exp.public_spec))
+        self.assertEqual(restored.path, exp.path)
+
+    def testFromJSONErrorTruncatesSpec(self):
+        spec = {
+            "run": "f1",
+            "config": {f"key_{i}": "x" * 100 for i in range(1000)},
+            "invalid_argument": True,
+        }
+        with self.assertRaises(TuneError) as ctx:
+            Experiment.from_json("foo", spec)
+
+        message = str(ctx.exception)
+        self.assertIn("... [truncated]", message)
+        spec_dump = message.split("specification:\n\n ", 1)[1].split(".\n\n")[0]
+        self.assertTrue(spec_dump.endswith("... [truncated]"))
+        self.assertLess(len(message), 4096 + 1000)
+
     def testConvertExperimentIncorrect(self):
         self.assertRaises(TuneError, lambda: _convert_to_experiment_list("hi"))
 
+    def testConvertExperimentListIncorrect(self):
+        exp1 = Experiment(
+            **{"name": "foo", "run": "f1", "config": {"script_min_iter_time_s": 0}}
+        )
+        self.assertRaises(TuneError, lambda: _convert_to_experiment_list([exp1, "hi"]))
+
     def testFuncTrainableCheckpointConfigValidation(self):
         """Raise an error when trying to specify checkpoint_at_end/checkpoint_frequency
         with a function trainable."""
@@ -115,7 +289,6 @@ class ValidateUtilTest(unittest.TestCase):
 
 
 if __name__ == "__main__":
-    import pytest
     import sys
 
     sys.exit(pytest.main(["-v", __file__]))